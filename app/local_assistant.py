@@ -1,20 +1,63 @@
+import asyncio
 import os
-import textwrap
-
+import re
+import sys
+import threading
+from collections import defaultdict, deque
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from openai import OpenAI
-
-from app.mem0_client import Mem0Client
 
-# Load env from .env at project root
+# Load env from .env at project root, before the app modules below read
+# their settings (MEM0_BASE_URL, ...) from it.
 load_dotenv()
 
+from app.mem0_client import Mem0Client  # noqa: E402
+from app.sem_cache import SemanticCache  # noqa: E402
+
 # ---- Global state ----
 
-# OpenAI + Mem0 clients
-oa_client = OpenAI()
-# We'll pass agent_id explicitly so we can swap agents at runtime.
-mem_client = Mem0Client(default_user_id="jose", default_agent_id=None)
+# OpenAI + Mem0 clients, created on first use: openai drags in httpx and
+# pydantic, which we don't want to pay for at import / CLI startup.
+_oa = None
+_mem = None
+
+
+def _get_oa():
+    global _oa
+    if _oa is None:
+        from openai import OpenAI
+
+        _oa = OpenAI()
+    return _oa
+
+
+def _get_mem() -> Mem0Client:
+    global _mem
+    if _mem is None:
+        # We'll pass agent_id explicitly so we can swap agents at runtime.
+        _mem = Mem0Client(default_user_id="jose", default_agent_id=None)
+    return _mem
+
+
+# Answers to previous queries, keyed by query embedding + agent.
+sem_cache = SemanticCache()
+
+EMBED_MODEL = "text-embedding-3-small"
+
+# Recent turn embeddings per agent (newest first), blended into the cache key
+# so follow-ups like "what about the other one?" still hit.
+CONTEXT_TURNS = 4
+CONTEXT_ALPHA = 0.7
+CONTEXT_DECAY = 0.6
+_turn_history = defaultdict(lambda: deque(maxlen=CONTEXT_TURNS))
+
+# (agent_id, normalized query) pairs whose mem0 search came back empty. Short
+# TTL: a stale entry only costs memory context on an immediate repeat.
+_search_misses = TTLCache(maxsize=2048, ttl=30)
 
 CURRENT_AGENT_ID = "vera"
 
@@ -23,8 +66,17 @@ SYSTEM_PROMPT = """You are Jose's personal assistant.
 You have access to an external long-term memory system.
 Use the provided memories as context, but do NOT mention the memory system by name.
 Always keep answers short, direct, and practical.
+Be concise; under 40 words unless asked.
 """
 
+# Short questions that don't ask for an explanation go to the smaller model
+# with a tighter output cap.
+CHAT_MODEL = "gpt-4.1-mini"
+CHAT_MAX_TOKENS = 512
+FAST_CHAT_MODEL = "gpt-4o-mini"
+FAST_CHAT_MAX_TOKENS = 120
+_EXPLAIN_RE = re.compile("explain|why|how", re.IGNORECASE)
+
 
 # ---------------- Memory formatting helpers ----------------
 
@@ -47,61 +99,137 @@ def _normalize_mem_items(obj):
     return [obj]
 
 
+def _fmt_item(m) -> str:
+    """Render a single memory as '[id] (flags) text'."""
+    if not isinstance(m, dict):
+        return str(m)
+
+    get = m.get
+    memory_id = get("id") or get("_id") or "?"
+    text = get("text") or get("memory") or get("data", {}).get("memory") or str(m)
+    meta = get("metadata") or get("meta") or {}
+    flags = meta.get("source") or ""
+    if meta.get("important"):
+        flags = f"{flags}, important" if flags else "important"
+    if flags:
+        return f"[{memory_id}] ({flags}) {text}"
+    return f"[{memory_id}] {text}"
+
+
 def format_memories(memories, limit: int = 20) -> str:
     """Turn raw memories into a readable list."""
     items = _normalize_mem_items(memories)
     if not items:
         return "No memories found."
+    return "\n".join([_fmt_item(m) for m in items[:limit]])
 
-    lines = []
-    for m in items[:limit]:
-        if not isinstance(m, dict):
-            lines.append(str(m))
-            continue
 
-        memory_id = m.get("id") or m.get("_id") or "?"
-        text = (
-            m.get("text")
-            or m.get("memory")
-            or m.get("data", {}).get("memory")
-            or str(m)
+# Cap on the memory context sent with each chat turn, in tokens.
+MEMORY_TOKEN_BUDGET = 600
+
+
+# tiktoken encoding for CHAT_MODEL. tiktoken may download the encoding file
+# (no timeout), so it's loaded once on a daemon thread and never on the event
+# loop. Until it's ready, or for good if loading failed, token counts are
+# estimated from length (~4 chars per token).
+_encoding = None
+_encoding_loader: Optional[threading.Thread] = None
+
+
+def _load_encoding() -> None:
+    global _encoding
+    try:
+        import tiktoken
+
+        _encoding = tiktoken.encoding_for_model(CHAT_MODEL)
+    except Exception as e:
+        print(f"[tokenizer unavailable, estimating token counts] {e}")
+
+
+def _start_encoding_load() -> None:
+    """Kick off the tokenizer load in the background; only the first call does anything."""
+    global _encoding_loader
+    if _encoding_loader is None:
+        _encoding_loader = threading.Thread(
+            target=_load_encoding, name="tiktoken-load", daemon=True
         )
-        meta = m.get("metadata") or m.get("meta") or {}
-        source = meta.get("source") or ""
-        important = meta.get("important")
-        flags = []
-        if source:
-            flags.append(source)
-        if important:
-            flags.append("important")
-        prefix = f"[{memory_id}]"
-        if flags:
-            prefix += " (" + ", ".join(flags) + ")"
-        lines.append(f"{prefix} {text}")
+        _encoding_loader.start()
+
+
+@lru_cache(maxsize=4096)
+def _exact_tokens(text: str) -> int:
+    # memoized: the same memories tend to come back turn after turn
+    return len(_encoding.encode(text))
+
+
+def _count_tokens(text: str) -> int:
+    if _encoding is None:
+        return (len(text) + 3) // 4
+    return _exact_tokens(text)
+
+
+def _truncate_tokens(text: str, max_tokens: int) -> str:
+    if _encoding is None:
+        return text[: max_tokens * 4]
+    return _encoding.decode(_encoding.encode(text)[:max_tokens])
+
+
+def _score(m) -> float:
+    return (m.get("score") or 0) if isinstance(m, dict) else 0
+
+
+def format_memory_context(memories, limit: int = 8, budget: int = MEMORY_TOKEN_BUDGET) -> str:
+    """
+    Like format_memories, but best-scoring first and capped at `budget`
+    tokens (separators included). A best memory that is over budget on its
+    own is cut down to fit; later ones that don't fit are skipped, so
+    shorter lower-scored memories can still get in.
+    """
+    items = sorted(_normalize_mem_items(memories), key=_score, reverse=True)[:limit]
+    if not items:
+        return "No memories found."
+
+    lines = []
+    used = 0
+    for m in items:
+        line = _fmt_item(m)
+        sep = 1 if lines else 0  # the "\n" joining it to the previous line
+        cost = sep + _count_tokens(line)
+        if used + cost > budget:
+            if lines:
+                continue
+            line = _truncate_tokens(line, budget)
+            cost = _count_tokens(line)
+        lines.append(line)
+        used += cost
     return "\n".join(lines)
 
 
 # ---------------- Importance / storage heuristics ----------------
 
+_IMPORTANT_KEYWORDS = (
+    "remember",
+    "note this",
+    "important",
+    "permanent",
+    "preference",
+    "goal",
+    "target",
+    "schedule",
+    "budget",
+)
+# One alternation scans the text in a single pass. Unanchored on purpose, so
+# it matches the same substrings as before ("goals", "budgeting", ...).
+_IMPORTANT_RE = re.compile("|".join(map(re.escape, _IMPORTANT_KEYWORDS)), re.IGNORECASE)
+
+
 def should_store_memory(user_input: str, answer: str) -> bool:
     """
     Super simple heuristic for whether to store a turn as 'important'.
     This is intentionally cheap and local. You can later swap this out for
     an LLM-based classifier if you want.
     """
-    text = (user_input + " " + answer).lower()
-    keywords = [
-        "remember",
-        "note this",
-        "important",
-        "permanent",
-        "preference",
-        "goal",
-        "target",
-        "schedule",
-        "budget",
-    ]
-    if any(k in text for k in keywords):
+    if _IMPORTANT_RE.search(user_input) or _IMPORTANT_RE.search(answer):
         return True
     # Also mark long / detailed inputs as important
     if len(user_input) > 140:
@@ -111,31 +239,136 @@ def should_store_memory(user_input: str, answer: str) -> bool:
 
 # ---------------- Core chat loop ----------------
 
-def chat_once(user_input: str) -> str:
+@lru_cache(maxsize=1024)
+def _embed(text: str) -> np.ndarray:
+    """Embed text, memoized so repeated queries skip the API round-trip."""
+    resp = _get_oa().embeddings.create(model=EMBED_MODEL, input=text)
+    vec = np.asarray(resp.data[0].embedding, dtype=np.float32)
+    # shared by every cache hit, so make sure no caller mutates it
+    vec.flags.writeable = False
+    return vec
+
+
+def _lookup_key(q_vec: np.ndarray, agent_id: str) -> np.ndarray:
+    """Blend the query embedding with decayed embeddings of recent turns."""
+    history = _turn_history[agent_id]
+    if not history:
+        return q_vec
+
+    weights = CONTEXT_DECAY ** np.arange(len(history), dtype=np.float32)
+    context = weights @ np.stack(history)
+    key = CONTEXT_ALPHA * q_vec + (1 - CONTEXT_ALPHA) * context
+    return key / np.linalg.norm(key)
+
+
+def _complete(
+    on_token: Optional[Callable[[str], None]] = None, **kwargs
+) -> Tuple[str, Optional[str]]:
+    """
+    Run a streaming chat completion, handing each text delta to on_token.
+    Returns (answer, finish_reason); finish_reason is "length" when the
+    answer was cut off by max_tokens.
+    """
+    parts = []
+    finish_reason = None
+    for chunk in _get_oa().chat.completions.create(stream=True, **kwargs):
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        delta = choice.delta.content
+        if delta:
+            parts.append(delta)
+            if on_token is not None:
+                on_token(delta)
+        if choice.finish_reason:
+            finish_reason = choice.finish_reason
+    return "".join(parts), finish_reason
+
+
+def _store_turn(user_input: str, answer: str) -> None:
+    """Queue a chat turn for Mem0, so the user doesn't wait on the write."""
+    important = should_store_memory(user_input, answer)
+    _get_mem().add_memories_async(
+        messages=[
+            {"role": "user", "content": user_input},
+            {"role": "assistant", "content": answer},
+        ],
+        agent_id=CURRENT_AGENT_ID,
+        metadata={"source": "local_assistant", "important": important},
+    )
+
+
+async def chat_once(
+    user_input: str, on_token: Optional[Callable[[str], None]] = None
+) -> str:
+    """
+    Answer one user turn. If on_token is given, it receives the answer text
+    as it arrives (the whole answer at once on a semantic-cache hit).
+    """
     global CURRENT_AGENT_ID
 
-    # 1) search memories relevant to the input
+    # 0) start the memory search in the background, and embed the query for
+    # the semantic cache meanwhile; both are independent network calls
+    miss_key = (CURRENT_AGENT_ID, user_input.strip().lower())
+    search = None
+    if miss_key not in _search_misses:
+        search = asyncio.create_task(
+            asyncio.to_thread(_get_mem().search, query=user_input, agent_id=CURRENT_AGENT_ID)
+        )
+
     try:
-        search_results = mem_client.search(query=user_input, agent_id=CURRENT_AGENT_ID) or []
+        q_vec = await asyncio.to_thread(_embed, user_input)
     except Exception as e:
-        print(f"[mem0 search error] {e}")
-        search_results = []
+        print(f"[embedding error] {e}")
+        q_vec = None
+
+    # 1) answer from the semantic cache if we've seen this question before,
+    # without waiting on the search. Inputs that look like new facts
+    # ("remember my budget is 600") always get a fresh answer: they're too
+    # similar to the fact they replace.
+    if q_vec is not None:
+        cache_key = _lookup_key(q_vec, CURRENT_AGENT_ID)
+        hit = None
+        if not should_store_memory(user_input, ""):
+            hit = sem_cache.lookup(cache_key, agent_id=CURRENT_AGENT_ID)
+        if hit is not None:
+            if search is not None:
+                search.cancel()
+            _turn_history[CURRENT_AGENT_ID].appendleft(q_vec)
+            if on_token is not None:
+                on_token(hit.answer)
+            # the turn is still part of the conversation history in Mem0
+            _store_turn(user_input, hit.answer)
+            return hit.answer
+
+    # cache miss: now we need the memories
+    search_results = []
+    if search is not None:
+        try:
+            search_results = await search
+        except Exception as e:
+            print(f"[mem0 search error] {e}")
+        else:
+            if not _normalize_mem_items(search_results):
+                _search_misses[miss_key] = True
 
-    memory_block = format_memories(search_results, limit=8)
+    _start_encoding_load()
+    memory_block = format_memory_context(search_results, limit=8)
 
-    # 2) build prompt with memory context
+    # 2) build prompt with memory context.
+    # The system prompt stays byte-identical across turns so the provider's
+    # prompt cache can reuse the prefix; everything per-turn goes after it.
     messages = [
         {
             "role": "system",
             "content": SYSTEM_PROMPT,
         },
         {
-            "role": "system",
-            "content": f"Current agent: {CURRENT_AGENT_ID}",
-        },
-        {
-            "role": "system",
-            "content": "Relevant prior memories:\n" + memory_block,
+            "role": "user",
+            "content": (
+                f"Current agent: {CURRENT_AGENT_ID}\n"
+                "Relevant prior memories:\n" + memory_block
+            ),
         },
         {
             "role": "user",
@@ -144,33 +377,99 @@ def chat_once(user_input: str) -> str:
     ]
 
     # 3) call OpenAI
-    resp = oa_client.chat.completions.create(
-        model="gpt-4.1-mini",
+    is_trivial = len(user_input) < 80 and not _EXPLAIN_RE.search(user_input)
+    answer, finish_reason = await asyncio.to_thread(
+        _complete,
+        on_token,
+        model=FAST_CHAT_MODEL if is_trivial else CHAT_MODEL,
         messages=messages,
         temperature=0.4,
+        max_tokens=FAST_CHAT_MAX_TOKENS if is_trivial else CHAT_MAX_TOKENS,
     )
 
-    answer = resp.choices[0].message.content
+    if q_vec is not None:
+        # don't replay an answer that was truncated at max_tokens
+        if finish_reason != "length":
+            sem_cache.add(cache_key, query=user_input, answer=answer, agent_id=CURRENT_AGENT_ID)
+        _turn_history[CURRENT_AGENT_ID].appendleft(q_vec)
 
     # 4) store this turn back into Mem0
-    try:
-        important = should_store_memory(user_input, answer)
-        mem_client.add_memories(
-            messages=[
-                {"role": "user", "content": user_input},
-                {"role": "assistant", "content": answer},
-            ],
-            agent_id=CURRENT_AGENT_ID,
-            metadata={"source": "local_assistant", "important": important},
-        )
-    except Exception as e:
-        print(f"[mem0 add error] {e}")
+    _store_turn(user_input, answer)
 
     return answer
 
 
 # ---------------- /mem commands ----------------
 
+def _mem_list(arg: str) -> str:
+    try:
+        res = _get_mem().list_memories(agent_id=CURRENT_AGENT_ID)
+    except Exception as e:
+        return f"[mem0 list error] {e}"
+    return format_memories(res, limit=30)
+
+
+def _mem_search(arg: str) -> str:
+    if not arg:
+        return "Usage: /mem search <query>"
+    try:
+        res = _get_mem().search(query=arg, agent_id=CURRENT_AGENT_ID)
+    except Exception as e:
+        return f"[mem0 search error] {e}"
+    return format_memories(res, limit=30)
+
+
+def _mem_show(arg: str) -> str:
+    if not arg:
+        return "Usage: /mem show <memory_id>"
+    try:
+        m = _get_mem().get_memory(memory_id=arg)
+    except Exception as e:
+        return f"[mem0 get error] {e}"
+    return format_memories(m, limit=1)
+
+
+def _mem_delete(arg: str) -> str:
+    if not arg:
+        return "Usage: /mem delete <memory_id>"
+    try:
+        res = _get_mem().delete_memory(memory_id=arg)
+    except Exception as e:
+        return f"[mem0 delete error] {e}"
+    # cached answers may have been built from the memory we just dropped
+    sem_cache.clear(CURRENT_AGENT_ID)
+    return f"Deleted memory {arg}: {res}"
+
+
+def _mem_clear(arg: str) -> str:
+    try:
+        res = _get_mem().delete_all(agent_id=CURRENT_AGENT_ID)
+    except Exception as e:
+        return f"[mem0 clear error] {e}"
+    # cached answers may have been built from the memories we just dropped
+    sem_cache.clear(CURRENT_AGENT_ID)
+    return f"Cleared all memories for agent '{CURRENT_AGENT_ID}': {res}"
+
+
+# sub-command -> handler(arg); "" is a bare "/mem"
+_MEM_HANDLERS = {
+    "": _mem_list,
+    "search": _mem_search,
+    "show": _mem_show,
+    "delete": _mem_delete,
+    "clear": _mem_clear,
+}
+
+_MEM_USAGE = (
+    "Unknown /mem command. Use:\n"
+    "/mem\n"
+    "/mem search <query>\n"
+    "/mem show <id>\n"
+    "/mem delete <id>\n"
+    "/mem clear"
+)
+
+
 def handle_mem_command(cmd: str) -> str:
     """
     /mem                      -> list recent memories
@@ -179,69 +478,12 @@ def handle_mem_command(cmd: str) -> str:
     /mem delete <id>          -> delete a single memory
     /mem clear                -> delete all memories for current agent
     """
-    global CURRENT_AGENT_ID
-
     parts = cmd.strip().split(maxsplit=2)
-
-    # just "/mem"
-    if len(parts) == 1:
-        try:
-            res = mem_client.list_memories(agent_id=CURRENT_AGENT_ID)
-        except Exception as e:
-            return f"[mem0 list error] {e}"
-        return format_memories(res, limit=30)
-
     sub = parts[1].lower() if len(parts) >= 2 else ""
+    arg = parts[2] if len(parts) == 3 else ""
 
-    # "/mem search <query>"
-    if sub == "search":
-        if len(parts) == 2:
-            return "Usage: /mem search <query>"
-        query = parts[2]
-        try:
-            res = mem_client.search(query=query, agent_id=CURRENT_AGENT_ID)
-        except Exception as e:
-            return f"[mem0 search error] {e}"
-        return format_memories(res, limit=30)
-
-    # "/mem show <id>"
-    if sub == "show":
-        if len(parts) == 2:
-            return "Usage: /mem show <memory_id>"
-        memory_id = parts[2]
-        try:
-            m = mem_client.get_memory(memory_id=memory_id)
-        except Exception as e:
-            return f"[mem0 get error] {e}"
-        return format_memories(m, limit=1)
-
-    # "/mem delete <id>"
-    if sub == "delete":
-        if len(parts) == 2:
-            return "Usage: /mem delete <memory_id>"
-        memory_id = parts[2]
-        try:
-            res = mem_client.delete_memory(memory_id=memory_id)
-        except Exception as e:
-            return f"[mem0 delete error] {e}"
-        return f"Deleted memory {memory_id}: {res}"
-
-    # "/mem clear"
-    if sub == "clear":
-        try:
-            res = mem_client.delete_all(agent_id=CURRENT_AGENT_ID)
-        except Exception as e:
-            return f"[mem0 clear error] {e}"
-        return f"Cleared all memories for agent '{CURRENT_AGENT_ID}': {res}"
-
-    return (
-        "Unknown /mem command. Use:\n"
-        "/mem\n"
-        "/mem search <query>\n"
-        "/mem show <id>\n"
-        "/mem delete <id>\n"
-        "/mem clear"
-    )
+    handler = _MEM_HANDLERS.get(sub)
+    return handler(arg) if handler else _MEM_USAGE
 
 
 # ---------------- /agent commands (multi-agent memory) ----------------
@@ -269,43 +511,81 @@ def handle_agent_command(cmd: str) -> str:
 
 # ---------------- Main loop ----------------
 
-def main():
+# command word -> (output label, handler)
+_COMMANDS = {
+    "/mem": ("MEMORIES", handle_mem_command),
+    "/agent": ("AGENT", handle_agent_command),
+}
+
+
+def _write(text: str) -> None:
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+
+def _warm_up() -> None:
+    """Create the lazily-built OpenAI client ahead of the first turn."""
+    # Import + construction only, no network, so the first turn can safely
+    # wait on it. (The tokenizer is deliberately not loaded here: tiktoken
+    # may download its encoding file, with no timeout.)
+    try:
+        _get_oa()
+    except Exception:
+        # the chat loop reports it when the first turn hits the same error
+        pass
+
+
+async def main():
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.patch_stdout import patch_stdout
+
     print("Local assistant wired to Mem0.")
     print("Type 'exit' to quit.")
     print("Commands:")
     print("  /mem, /mem search <q>, /mem show <id>, /mem delete <id>, /mem clear")
     print("  /agent, /agent <name>")
 
-    while True:
-        try:
-            user_input = input("\nYou: ").strip()
-        except (EOFError, KeyboardInterrupt):
-            print("\nBye.")
-            break
-
-        if user_input.lower() in {"exit", "quit"}:
-            print("Bye.")
-            break
-
-        # /mem commands
-        if user_input.startswith("/mem"):
-            out = handle_mem_command(user_input)
-            print("\n[MEMORIES]")
-            print(out)
-            continue
-
-        # /agent commands
-        if user_input.startswith("/agent"):
-            out = handle_agent_command(user_input)
-            print("\n[AGENT]")
-            print(out)
-            continue
-
-        # normal chat
-        reply = chat_once(user_input)
-        print("\nAssistant:")
-        print(textwrap.fill(reply, width=100))
+    # The prompt is async, so this runs while the user types the first message.
+    warm_up = asyncio.ensure_future(asyncio.to_thread(_warm_up))
+    _start_encoding_load()
+    session = PromptSession()
+
+    # Route prints from background threads (e.g. the mem0 writer) above the
+    # prompt instead of garbling the line being typed.
+    with patch_stdout():
+        while True:
+            try:
+                user_input = (await session.prompt_async("\nYou: ")).strip()
+            except (EOFError, KeyboardInterrupt):
+                print("\nBye.")
+                break
+
+            if user_input.lower() in {"exit", "quit"}:
+                print("Bye.")
+                break
+
+            # /mem and /agent commands
+            command = _COMMANDS.get(user_input.split(maxsplit=1)[0]) if user_input else None
+            if command:
+                label, handler = command
+                out = await asyncio.to_thread(handler, user_input)
+                print(f"\n[{label}]")
+                print(out)
+                continue
+
+            # normal chat
+            await warm_up
+            print("\nAssistant:")
+            try:
+                await chat_once(user_input, on_token=_write)
+            except Exception as e:
+                # e.g. no OPENAI_API_KEY, or the completion request failed
+                print(f"\n[chat error] {e}")
+            print()
+
+    if _mem is not None:
+        _mem.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
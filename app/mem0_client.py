@@ -1,13 +1,58 @@
+import atexit
+import base64
+import binascii
 import os
+import queue
+import threading
+import time
 from typing import Any, Dict, List, Optional
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 MEM0_BASE_URL = os.getenv("MEM0_BASE_URL", "http://127.0.0.1:8000")
 DEFAULT_USER_ID = os.getenv("MEM0_DEFAULT_USER_ID", None)
 DEFAULT_AGENT_ID = os.getenv("MEM0_DEFAULT_AGENT_ID", None)
 
+# Background writer: how many queued writes to drain per wakeup, and how long
+# to wait for a burst to fill up before sending.
+WRITE_BATCH_SIZE = 16
+WRITE_BATCH_WAIT = 0.05
+
+_JSON_HEADERS = {"content-type": "application/json"}
+
+# Queued after the last write by close(); tells the writer thread to exit.
+_STOP = object()
+
+
+def _as_vector(value: Any) -> Any:
+    """Decode an embedding (JSON float list or base64 float32 bytes) to a numpy array."""
+    # numpy is only needed once the server actually ships vectors
+    import numpy as np
+
+    if isinstance(value, str):
+        return np.frombuffer(base64.b64decode(value), dtype=np.float32)
+    if isinstance(value, list):
+        return np.asarray(value, dtype=np.float32)
+    return value
+
+
+def _decode_embeddings(data: Any) -> Any:
+    """Replace 'embedding' fields on returned memories with float32 arrays, in place."""
+    items = data.get("results", [data]) if isinstance(data, dict) else data
+    if isinstance(items, list):
+        for item in items:
+            if isinstance(item, dict) and "embedding" in item:
+                try:
+                    item["embedding"] = _as_vector(item["embedding"])
+                except (binascii.Error, ValueError, TypeError):
+                    # optional field; a malformed one mustn't fail the response
+                    pass
+    return data
+
 
 class Mem0Client:
     def __init__(
@@ -16,21 +61,148 @@ class Mem0Client:
         default_user_id: Optional[str] = DEFAULT_USER_ID,
         default_agent_id: Optional[str] = DEFAULT_AGENT_ID,
     ) -> None:
+        # Setting these (here or later) also refreshes the derived values
+        # below, so they're resolved once rather than on every call.
+        self._default_user_id = default_user_id
+        self._default_agent_id = default_agent_id
+        self._rebuild_ids()
         self.base_url = base_url or MEM0_BASE_URL
-        self.default_user_id = default_user_id
-        self.default_agent_id = default_agent_id
+
+        # One keep-alive session for all calls, so we don't pay a TCP
+        # handshake per request. Retries only cover idempotent verbs (urllib3
+        # default), so a POST /memories is never replayed.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=50,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504]),
+        )
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._write_queue: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self._closed = False
+
+    # ---- Settings ----
+
+    @property
+    def base_url(self) -> str:
+        return self._base_url
+
+    @base_url.setter
+    def base_url(self, value: str) -> None:
+        self._base_url = value
+        self._root = value.rstrip("/")
+        self._memories_url = self._url("/memories")
+        self._search_url = self._url("/search")
+
+    @property
+    def default_user_id(self) -> Optional[str]:
+        return self._default_user_id
+
+    @default_user_id.setter
+    def default_user_id(self, value: Optional[str]) -> None:
+        self._default_user_id = value
+        self._rebuild_ids()
+
+    @property
+    def default_agent_id(self) -> Optional[str]:
+        return self._default_agent_id
+
+    @default_agent_id.setter
+    def default_agent_id(self, value: Optional[str]) -> None:
+        self._default_agent_id = value
+        self._rebuild_ids()
+
+    def _rebuild_ids(self) -> None:
+        self._base_ids: Dict[str, str] = {
+            k: v
+            for k, v in (("user_id", self._default_user_id), ("agent_id", self._default_agent_id))
+            if v
+        }
+
+    def close(self) -> None:
+        """Send any queued writes, stop the writer thread and close the session."""
+        with self._writer_lock:
+            self._closed = True
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._write_queue.put(_STOP)
+            writer.join()
+            atexit.unregister(self.close)
+        self._session.close()
+
+    def __enter__(self) -> "Mem0Client":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
 
     # ---- Core helpers ----
 
     def _url(self, path: str) -> str:
-        return f"{self.base_url.rstrip('/')}{path}"
+        return f"{self._root}{path}"
+
+    def _identifiers(
+        self,
+        user_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        ids: Dict[str, Any] = dict(self._base_ids)
+        if user_id:
+            ids["user_id"] = user_id
+        if agent_id:
+            ids["agent_id"] = agent_id
+        if run_id:
+            ids["run_id"] = run_id
+        return ids
 
     def _handle(self, resp: requests.Response) -> Any:
         resp.raise_for_status()
         if resp.headers.get("content-type", "").startswith("application/json"):
-            return resp.json()
+            return _decode_embeddings(orjson.loads(resp.content))
         return resp.text
 
+    def _ensure_writer(self) -> None:
+        # caller holds _writer_lock
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write_loop, name="mem0-writer", daemon=True
+            )
+            self._writer.start()
+            atexit.register(self.close)
+
+    def _write_loop(self) -> None:
+        while True:
+            batch = [self._write_queue.get()]
+            deadline = time.monotonic() + WRITE_BATCH_WAIT
+            while len(batch) < WRITE_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+                if batch[-1] is _STOP:
+                    break
+
+            # No batch endpoint on the server, so send them back-to-back over
+            # the keep-alive session.
+            for kwargs in batch:
+                if kwargs is _STOP:
+                    self._write_queue.task_done()
+                    return
+                try:
+                    self.add_memories(**kwargs)
+                except Exception as e:
+                    print(f"[mem0 add error] {e}")
+                finally:
+                    self._write_queue.task_done()
+
     # ---- API methods ----
 
     def add_memories(
@@ -44,19 +216,44 @@ class Mem0Client:
         """POST /memories"""
         payload: Dict[str, Any] = {
             "messages": messages,
+            **self._identifiers(user_id, agent_id, run_id),
         }
-        if user_id or self.default_user_id:
-            payload["user_id"] = user_id or self.default_user_id
-        if agent_id or self.default_agent_id:
-            payload["agent_id"] = agent_id or self.default_agent_id
-        if run_id:
-            payload["run_id"] = run_id
         if metadata:
             payload["metadata"] = metadata
 
-        resp = requests.post(self._url("/memories"), json=payload, timeout=30)
+        resp = self._session.post(
+            self._memories_url, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=30
+        )
         return self._handle(resp)
 
+    def add_memories_async(
+        self,
+        messages: List[Dict[str, str]],
+        user_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        run_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Queue a POST /memories on the background writer and return immediately."""
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("Mem0Client is closed")
+            self._ensure_writer()
+            self._write_queue.put(
+                {
+                    "messages": messages,
+                    "user_id": user_id,
+                    "agent_id": agent_id,
+                    "run_id": run_id,
+                    "metadata": metadata,
+                }
+            )
+
+    def flush(self) -> None:
+        """Block until every queued write has been sent."""
+        if self._writer is not None:
+            self._write_queue.join()
+
     def list_memories(
         self,
         user_id: Optional[str] = None,
@@ -64,30 +261,29 @@ class Mem0Client:
         run_id: Optional[str] = None,
     ) -> Any:
         """GET /memories"""
-        params: Dict[str, Any] = {}
-        if user_id or self.default_user_id:
-            params["user_id"] = user_id or self.default_user_id
-        if agent_id or self.default_agent_id:
-            params["agent_id"] = agent_id or self.default_agent_id
-        if run_id:
-            params["run_id"] = run_id
+        params = self._identifiers(user_id, agent_id, run_id)
 
-        resp = requests.get(self._url("/memories"), params=params, timeout=30)
+        resp = self._session.get(self._memories_url, params=params, timeout=30)
         return self._handle(resp)
 
     def get_memory(self, memory_id: str) -> Any:
         """GET /memories/{memory_id}"""
-        resp = requests.get(self._url(f"/memories/{memory_id}"), timeout=30)
+        resp = self._session.get(self._url(f"/memories/{memory_id}"), timeout=30)
         return self._handle(resp)
 
     def update_memory(self, memory_id: str, data: Dict[str, Any]) -> Any:
         """PUT /memories/{memory_id}"""
-        resp = requests.put(self._url(f"/memories/{memory_id}"), json=data, timeout=30)
+        resp = self._session.put(
+            self._url(f"/memories/{memory_id}"),
+            data=orjson.dumps(data),
+            headers=_JSON_HEADERS,
+            timeout=30,
+        )
         return self._handle(resp)
 
     def delete_memory(self, memory_id: str) -> Any:
         """DELETE /memories/{memory_id}"""
-        resp = requests.delete(self._url(f"/memories/{memory_id}"), timeout=30)
+        resp = self._session.delete(self._url(f"/memories/{memory_id}"), timeout=30)
         return self._handle(resp)
 
     def delete_all(
@@ -97,15 +293,9 @@ class Mem0Client:
         run_id: Optional[str] = None,
     ) -> Any:
         """DELETE /memories (all for a given identifier)"""
-        params: Dict[str, Any] = {}
-        if user_id or self.default_user_id:
-            params["user_id"] = user_id or self.default_user_id
-        if agent_id or self.default_agent_id:
-            params["agent_id"] = agent_id or self.default_agent_id
-        if run_id:
-            params["run_id"] = run_id
+        params = self._identifiers(user_id, agent_id, run_id)
 
-        resp = requests.delete(self._url("/memories"), params=params, timeout=30)
+        resp = self._session.delete(self._memories_url, params=params, timeout=30)
         return self._handle(resp)
 
     def search(
@@ -117,20 +307,16 @@ class Mem0Client:
         filters: Optional[Dict[str, Any]] = None,
     ) -> Any:
         """POST /search"""
-        payload: Dict[str, Any] = {"query": query}
-        if user_id or self.default_user_id:
-            payload["user_id"] = user_id or self.default_user_id
-        if agent_id or self.default_agent_id:
-            payload["agent_id"] = agent_id or self.default_agent_id
-        if run_id:
-            payload["run_id"] = run_id
+        payload: Dict[str, Any] = {"query": query, **self._identifiers(user_id, agent_id, run_id)}
         if filters:
             payload["filters"] = filters
 
-        resp = requests.post(self._url("/search"), json=payload, timeout=60)
+        resp = self._session.post(
+            self._search_url, data=orjson.dumps(payload), headers=_JSON_HEADERS, timeout=60
+        )
         return self._handle(resp)
 
     def reset(self) -> Any:
         """POST /reset"""
-        resp = requests.post(self._url("/reset"), timeout=60)
+        resp = self._session.post(self._url("/reset"), timeout=60)
         return self._handle(resp)
\ No newline at end of file
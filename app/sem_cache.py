@@ -0,0 +1,88 @@
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+
+DEFAULT_THRESHOLD = 0.92
+# Rows preallocated per agent; the buffer doubles when it fills up.
+INITIAL_CAPACITY = 64
+
+
+class CacheEntry(NamedTuple):
+    query: str
+    answer: str
+    agent_id: Optional[str]
+    ts: float
+
+
+class _Partition:
+    """One agent's embeddings: a C-order float32 buffer plus parallel metadata."""
+
+    __slots__ = ("matrix", "size", "entries")
+
+    def __init__(self, dim: int) -> None:
+        self.matrix = np.empty((INITIAL_CAPACITY, dim), dtype=np.float32)
+        self.size = 0
+        self.entries: List[CacheEntry] = []
+
+    def append(self, v: np.ndarray, entry: CacheEntry) -> None:
+        if self.size == len(self.matrix):
+            grown = np.empty((2 * len(self.matrix), self.matrix.shape[1]), dtype=np.float32)
+            grown[: self.size] = self.matrix
+            self.matrix = grown
+        self.matrix[self.size] = v
+        self.size += 1
+        self.entries.append(entry)
+
+
+class SemanticCache:
+    """
+    In-memory cache of previous answers keyed by query embedding.
+
+    Entries are partitioned per agent_id. Each agent keeps its L2-normalized
+    embeddings in one contiguous float32 matrix, so a lookup is a single
+    matrix-vector product (cosine = dot) rather than a loop over rows.
+    """
+
+    def __init__(self, threshold: Optional[float] = None) -> None:
+        if threshold is None:
+            # read at construction, so a .env loaded after import still applies
+            threshold = float(os.getenv("SEM_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+        self.threshold = threshold
+        self._partitions: Dict[Optional[str], _Partition] = {}
+
+    # ---- Core helpers ----
+
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32).ravel()
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    # ---- API methods ----
+
+    def lookup(self, vec, agent_id: Optional[str]) -> Optional[CacheEntry]:
+        """Return the closest cached entry for this agent, if above threshold."""
+        part = self._partitions.get(agent_id)
+        if part is None:
+            return None
+
+        scores = part.matrix[: part.size] @ self._normalize(vec)
+        i = int(scores.argmax())
+        if scores[i] > self.threshold:
+            return part.entries[i]
+        return None
+
+    def add(self, vec, query: str, answer: str, agent_id: Optional[str]) -> None:
+        """Store an answer under the given query embedding."""
+        v = self._normalize(vec)
+        part = self._partitions.get(agent_id)
+        if part is None:
+            part = self._partitions[agent_id] = _Partition(v.shape[0])
+        part.append(v, CacheEntry(query=query, answer=answer, agent_id=agent_id, ts=time.time()))
+
+    def clear(self, agent_id: Optional[str]) -> None:
+        """Drop cached entries for one agent."""
+        self._partitions.pop(agent_id, None)